@@ -20,7 +20,7 @@ import os.path
 from io import BytesIO
 from typing import BinaryIO, Literal
 
-from .config import config
+from .config import config  # noqa: F401
 from .writer import LazyWriter, LazyCombiner
 
 
@@ -79,31 +79,30 @@ def combine(
             if not os.path.exists(_fp):
                 raise ValueError(f"File {_fp} does not exist.")
             with open(_fp, "rb") as _file:
-                if _file.read(LazyWriter.magic_len()) != LazyWriter.magic:
+                if not LazyWriter.is_magic(_file.read(LazyWriter.magic_len())):
                     raise ValueError(f"Invalid file format: {_fp}.")
         else:
             ini_pos = _fp.tell()
             magic = _fp.read(LazyWriter.magic_len())
             _fp.seek(ini_pos)
-            if magic != LazyWriter.magic:
+            if not LazyWriter.is_magic(magic):
                 raise ValueError("Invalid file format.")
 
     if validate:
         for file in files:
             _validate(file.path)
 
-    def _iter(path: str | BinaryIO):
-        if isinstance(path, str):
-            with open(path, "rb") as _file:
-                while _data := _file.read(config.copy_chunk_size):
-                    yield _data
-        else:
-            while _data := path.read(config.copy_chunk_size):
-                yield _data
-
     with LazyCombiner(archive, mode=mode) as combiner:
+        # reject names that do not fit the archive before anything is copied
+        for file in files:
+            combiner.check(file.name)
+
         for file in files:
-            combiner.write(_iter(file.path), file.name)
+            if isinstance(file.path, str):
+                with open(file.path, "rb") as _file:
+                    combiner.write(_file, file.name)
+            else:
+                combiner.write(file.path, file.name)
 
 
 def append(
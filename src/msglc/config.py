@@ -16,6 +16,7 @@
 from __future__ import annotations
 
 import gc
+import mmap
 from dataclasses import dataclass
 from io import BytesIO, BufferedReader
 from typing import Union, BinaryIO
@@ -23,7 +24,7 @@ from typing import Union, BinaryIO
 from msglc.utility import MockIO
 
 BufferWriter = Union[BinaryIO, BytesIO, BufferedReader]
-BufferReader = Union[BufferWriter, MockIO]
+BufferReader = Union[BufferWriter, MockIO, mmap.mmap]
 
 
 @dataclass
@@ -38,6 +39,7 @@ class Config:
     simple_repr: bool = True
     copy_chunk_size: int = 2**24  # 16MB
     numpy_encoder: bool = False
+    deterministic_sets: bool = True
 
 
 config = Config()
@@ -58,6 +60,7 @@ def configure(
     simple_repr: bool | None = None,
     copy_chunk_size: int | None = None,
     numpy_encoder: bool | None = None,
+    deterministic_sets: bool | None = None,
     magic: bytes | None = None,
 ):
     """
@@ -71,6 +74,7 @@ def configure(
             The size (in bytes) for the write buffer.
     :param read_buffer_size:
             The size (in bytes) for the read buffer.
+            Files opened from a path are memory-mapped, the buffer only applies if mapping is not possible.
     :param fast_loading:
             Flag to enable or disable fast loading.
             If enabled, the container will be read in one go, instead of reading each child separately.
@@ -91,9 +95,14 @@ def configure(
             The size (in bytes) for the copy chunk.
     :param numpy_encoder:
             Flag to enable or disable the `numpy` support.
-            If enabled, the `numpy` arrays will be encoded using the `dumps` method provided by `numpy`.
-            The arrays are stored as binary data directly.
+            If enabled, arrays of plain dtypes are stored as their dtype, shape and raw bytes.
+            Arrays of object or structured dtypes are encoded using the `dumps` method provided by `numpy`.
+            In both cases, the arrays are stored as binary data directly.
             If disabled, the `numpy` arrays will be converted to lists before encoding.
+    :param deterministic_sets:
+            Flag to enable or disable sorting of sets before encoding.
+            If enabled, sets are sorted so that the same set always produces the same bytes.
+            If disabled, sets are written in iteration order, which is faster and also works for unorderable elements.
     :param magic:
             Magic bytes (max length: 30) to set, used to identify the file format version.
     """
@@ -137,6 +146,9 @@ def configure(
     if isinstance(numpy_encoder, bool):
         config.numpy_encoder = numpy_encoder
 
+    if isinstance(deterministic_sets, bool):
+        config.deterministic_sets = deterministic_sets
+
     if isinstance(magic, bytes) and 0 < len(magic) <= max_magic_len:
         from msglc import LazyWriter
 
@@ -15,66 +15,63 @@
 
 from __future__ import annotations
 
+import re
 from functools import lru_cache
 
+# the same grammar `int()` accepts, checked up front so that plain keys do not raise and catch
+_match_integer = re.compile(r"\s*[+-]?\d+(?:_\d+)*\s*").fullmatch
+
 
-@lru_cache(maxsize=2**14)
 def _is_index(key: str) -> int | None:
-    try:
-        return int(key)
-    except ValueError:
-        return None
+    return int(key) if _match_integer(key) else None
 
 
-@lru_cache(maxsize=2**14)
 def normalise_index(index: int, total_size: int) -> int:
-    while index < -total_size:
-        index += total_size
-    while index >= total_size:
-        index -= total_size
-    return index
+    # wraps the index into [-total_size, total_size)
+    if total_size <= 0 or -total_size <= index < total_size:
+        return index
+    if index > 0:
+        return index % total_size
+    return index % total_size - total_size
 
 
-@lru_cache(maxsize=2**14)
 def _normalise_bound(index: int, total_size: int) -> int:
-    while index < 1 - total_size:
-        index += total_size
-    while index >= 1 + total_size:
-        index -= total_size
-    return index
+    # wraps the bound into [1 - total_size, 1 + total_size)
+    if total_size <= 0 or -total_size < index <= total_size:
+        return index
+    if index > 0:
+        return (index - 1) % total_size + 1
+    return (index - 1) % total_size + 1 - total_size
 
 
 @lru_cache(maxsize=2**14)
 def _is_slice(key: str, total_size: int) -> tuple | None:
-    if ":" not in key:
+    first, sep, rest = key.partition(":")
+    if not sep:
         return None
 
-    parts: list = list(key.split(":"))
-
-    if len(parts) == 2:
-        start = 0 if parts[0] == "" else _is_index(parts[0])
-        stop = total_size if parts[1] == "" else _is_index(parts[1])
-
-        if start is not None and stop is not None:
-            start = normalise_index(start, total_size)
-            stop = _normalise_bound(stop, total_size)
-            return start, stop, 1
-
+    second, sep, third = rest.partition(":")
+    if not sep:
+        # start:stop
+        step_part, stop_part = "", second
+    elif ":" in third:
         return None
+    else:
+        # start:step:stop
+        step_part, stop_part = second, third
 
-    if len(parts) == 3:
-        start = 0 if parts[0] == "" else _is_index(parts[0])
-        step = 1 if parts[1] == "" else _is_index(parts[1])
-        stop = total_size if parts[2] == "" else _is_index(parts[2])
-
-        if start is not None and step is not None and stop is not None:
-            start = normalise_index(start, total_size)
-            stop = _normalise_bound(stop, total_size)
-            return start, stop, step
+    start = 0 if first == "" else _is_index(first)
+    step = 1 if step_part == "" else _is_index(step_part)
+    stop = total_size if stop_part == "" else _is_index(stop_part)
 
+    if start is None or step is None or stop is None:
         return None
 
-    return None
+    return (
+        normalise_index(start, total_size),
+        _normalise_bound(stop, total_size),
+        step,
+    )
 
 
 @lru_cache(maxsize=2**14)
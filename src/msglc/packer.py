@@ -0,0 +1,61 @@
+#  Copyright (C) 2024-2025 Theodore Chang
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import struct
+
+from msgpack import Packer, packb
+
+
+def _pack_header(size: int, fix: int, tag16: int, tag32: int) -> bytes:
+    if size < 16:
+        return bytes((fix | size,))
+    if size < 2**16:
+        return struct.pack(">BH", tag16, size)
+    return struct.pack(">BI", tag32, size)
+
+
+try:
+    import msgspec
+
+    class MsgspecPacker:
+        """
+        A packer compatible with `msgpack.Packer` backed by `msgspec`.
+
+        Objects are encoded straight into the staging buffer of the writer via `encode_into`.
+        """
+
+        def __init__(self):
+            self._encoder = msgspec.msgpack.Encoder()
+
+        def pack(self, obj) -> bytes:
+            return self._encoder.encode(obj)
+
+        def encode_into(self, obj, buffer: bytearray, offset: int = -1) -> None:
+            self._encoder.encode_into(obj, buffer, offset)
+
+        @staticmethod
+        def pack_map_header(size: int) -> bytes:
+            return _pack_header(size, 0x80, 0xDE, 0xDF)
+
+        @staticmethod
+        def pack_array_header(size: int) -> bytes:
+            return _pack_header(size, 0x90, 0xDC, 0xDD)
+
+    # the TOC only holds lists, maps, ints and keys, msgspec encodes it to the same bytes several times faster
+    pack_toc = msgspec.msgpack.encode
+
+except ImportError:
+    MsgspecPacker = Packer  # type: ignore
+    pack_toc = packb
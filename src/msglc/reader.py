@@ -16,19 +16,33 @@
 from __future__ import annotations
 
 import asyncio
+import mmap
 import pickle
+import struct
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
 from io import BytesIO, BufferedReader
+from itertools import accumulate
 
 from bitarray import bitarray
-import msgpack
 
 from .config import config, increment_gc_counter, decrement_gc_counter, BufferReader
-from .index import normalise_index, to_index
+from .index import to_index
+from .toc import parse_node
 from .utility import MockIO
-from .writer import LazyWriter
+from .writer import LazyWriter, unpack_header
 from .unpacker import Unpacker, MsgpackUnpacker
 
 
+_missing = object()
+# bytes read along with the header on open, enough to hold the TOC of small archives
+# kept small and fixed since every nested reader in a combined archive pays for it
+_toc_prefetch_size: int = 2**12
+# msgpack array32 header
+_array_header: struct.Struct = struct.Struct(">BI")
+
+
 def to_obj(v):
     """
     Ensure the given value is JSON serializable.
@@ -55,7 +69,46 @@ async def async_get(v, key):
     return v[key]
 
 
+@lru_cache(maxsize=2**14)
+def _split_str(path: str) -> tuple:
+    """
+    Splits the given string path into a tuple of keys, empty keys are skipped.
+    Paths are often read repeatedly, thus the result is cached.
+    """
+    return tuple(v for v in path.split("/") if v != "")
+
+
+def _split_path(path: str | list | slice | None) -> tuple | list:
+    """
+    Splits the given path into a sequence of keys, empty keys are skipped.
+    """
+    if path is None:
+        return ()
+    if isinstance(path, str):
+        return _split_str(path)
+    if isinstance(path, list):
+        return [v for v in path if v != ""]
+    return (path,)
+
+
+def _open_mapped(path: str) -> BufferReader:
+    """
+    Maps the file at the given path into memory, so that random reads are served without system calls.
+    Falls back to a buffered file if the file cannot be mapped, for example, if it is empty.
+    """
+    with open(path, "rb") as file:
+        try:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            pass
+
+    return open(path, "rb", buffering=config.read_buffer_size)
+
+
 class LazyStats:
+    # updated on every read, slots keep the counters off the instance dict
+    __slots__ = ("_read_counter", "_call_counter")
+
     def __init__(self):
         self._read_counter: int = 0
         self._call_counter: int = 0
@@ -72,6 +125,9 @@ class LazyStats:
         return self._read_counter
 
     def bytes_per_call(self):
+        if 0 == self._call_counter:
+            return 0.0
+
         return self._read_counter / self._call_counter
 
     def clear(self):
@@ -107,6 +163,14 @@ class LazyItem:
         raise NotImplementedError
 
     def __eq__(self, other):
+        # containers of different sizes are never equal, no need to read anything
+        if isinstance(other, (list, dict, LazyItem)):
+            try:
+                if len(self) != len(other):
+                    return False
+            except TypeError:
+                pass
+
         return self.to_obj() == to_obj(other)
 
     def __str__(self):
@@ -129,7 +193,7 @@ class LazyItem:
     def _read(self, start: int, end: int):
         return self._unpack(self._readb(start, end))
 
-    def _child(self, toc: dict | int):
+    def _child(self, toc: dict | list | int):
         self._accessed_items += 1
 
         params: dict = {
@@ -138,35 +202,51 @@ class LazyItem:
             "unpacker": self._unpacker,
         }
 
-        # {"t": {"name1": start_pos, "name2": start_pos}}
+        # [{"name1": start_pos, "name2": start_pos}, None]
         # this is used in combined archives
         if isinstance(toc, int):
             self._buffer.seek(toc + self._offset)
             return LazyReader(self._buffer, **params)
 
-        if (child_toc := toc.get("t", None)) is None:
-            # {"p": [start_pos, end_pos]}
+        child_toc, child_pos, kind = parse_node(toc)
+
+        if child_toc is None:
+            # [None, [start_pos, end_pos]]
             # this is used in small objects
-            if 2 == len(child_pos := toc["p"]) and all(
-                isinstance(x, int) for x in child_pos
-            ):
+            if 2 == len(child_pos) and all(isinstance(x, int) for x in child_pos):
+                # [None, [start_pos, end_pos], "np"]
+                # this is used in numpy arrays encoded by numpy
+                if kind == "np":
+                    return pickle.loads(self._read(*child_pos))
+
+                # [None, [start_pos, end_pos], "nd"]
+                # this is used in numpy arrays of plain dtypes stored as [dtype, shape, raw bytes]
+                if kind == "nd":
+                    import numpy
+
+                    dtype, shape, data = self._read(*child_pos)
+                    return numpy.frombuffer(data, dtype=dtype).reshape(shape).copy()
+
+                # files written without the kind flag need to be sniffed
+                # pickled numpy arrays start with the pickle protocol marker
                 if (
                     isinstance(data := self._read(*child_pos), bytes)
-                    and b"multiarray" in data[:40]
+                    and data.startswith(b"\x80")
+                    and data.find(b"multiarray", 0, 40) >= 0
                 ):
                     return pickle.loads(data)
                 return data
 
-            # {"p": [[size1, start_pos, end_pos], [size2, start_pos, end_pos], [size3, start_pos, end_pos]]}
+            # [None, [[size1, start_pos, end_pos], [size2, start_pos, end_pos], [size3, start_pos, end_pos]]]
             # this is used in arrays of small objects
             return LazyList(toc, self._buffer, self._offset, **params)
 
-        # {"t": [...], "p": [start_pos, end_pos]}
+        # [[...], [start_pos, end_pos]]
         # this is used in lazy lists
         if isinstance(child_toc, list):
             return LazyList(toc, self._buffer, self._offset, **params)
 
-        # {"t": {...}, "p": [start_pos, end_pos]}
+        # [{...}, [start_pos, end_pos]]
         # this is used in lazy dicts
         if isinstance(child_toc, dict):
             return LazyDict(toc, self._buffer, self._offset, **params)
@@ -193,7 +273,7 @@ class LazyItem:
 class LazyList(LazyItem):
     def __init__(
         self,
-        toc: dict,
+        toc: dict | list,
         buffer: BufferReader,
         offset: int,
         *,
@@ -204,21 +284,21 @@ class LazyList(LazyItem):
         super().__init__(
             buffer, offset, counter=counter, cached=cached, unpacker=unpacker
         )
-        self._toc: list | None = toc.get(
-            "t", None
-        )  # if None, it's a list of small objects
-        self._pos: list = toc.get("p", None)  # noqa # if None, it comes from a combined archive
+        self._toc: list | None  # if None, it's a list of small objects
+        self._pos: list | None  # if None, it comes from a combined archive
+        self._toc, self._pos, _ = parse_node(toc)
         self._index: int = 0
-        self._cache: list = [None] * len(self)
-        self._mask: bitarray = bitarray(len(self))
+        # cumulative item counts of groups of small objects, stored as a compact array of int64
+        self._size_list: array = array("q", [0])
+        if self._toc is None:
+            self._size_list.extend(accumulate(size for size, _, _ in self._pos))
+        self._len: int = (
+            len(self._toc) if self._toc is not None else self._size_list[-1]
+        )
+        self._cache: list = [None] * self._len
+        self._mask: bitarray = bitarray(self._len)
         self._mask.setall(0)  # ensure all bits are 0
         self._full_loaded: bool = False
-        self._size_list: list = [0]
-        if self._toc is None:
-            total_size: int = 0
-            for size, _, _ in self._pos:
-                total_size += size
-                self._size_list.append(total_size)
 
     def __repr__(self):
         return (
@@ -228,73 +308,114 @@ class LazyList(LazyItem):
         )
 
     def _lookup_index(self, index: int) -> int:
-        low: int = 0
-        high: int = len(self._size_list) - 1
+        return bisect_right(self._size_list, index) - 1
 
-        while True:
-            mid: int = (low + high) // 2
+    def _all(self, start: int, end: int, size: int) -> list:
+        # a group is a run of `size` packed objects, prefixed with an array header it decodes in one call
+        return self._unpack(_array_header.pack(0xDD, size) + self._readb(start, end))
 
-            if self._size_list[mid] <= index < self._size_list[mid + 1]:
-                return mid
+    def _fetch(self, item: int) -> None:
+        if self._toc is not None:
+            self._mask[item] = 1
+            self._cache[item] = self._child(self._toc[item])
+        else:
+            lookup_index: int = self._lookup_index(item)
+            num_start, num_end = (
+                self._size_list[lookup_index],
+                self._size_list[lookup_index + 1],
+            )
+            self._mask[num_start:num_end] = 1
+            self._cache[num_start:num_end] = self._all(
+                *self._pos[lookup_index][1:], num_end - num_start
+            )
 
-            if index < self._size_list[mid]:
-                high = mid
-            else:
-                low = mid
+    def _coalesce(self, groups: list | None = None) -> list:
+        """
+        Merges adjacent groups that are not loaded yet into contiguous runs.
+        Each run is described by `[num_start, num_end, start_pos, end_pos]` and can be read in one go.
+
+        If a sorted list of group indices is given, only those groups are considered.
+        """
+        runs: list = []
+        for group in range(len(self._pos)) if groups is None else groups:
+            size, start, end = self._pos[group]
+            num_start: int = self._size_list[group]
+            if 0 == self._mask[num_start]:
+                if runs and runs[-1][1] == num_start and runs[-1][3] == start:
+                    runs[-1][1] = num_start + size
+                    runs[-1][3] = end
+                else:
+                    runs.append([num_start, num_start + size, start, end])
 
-    def _all(self, start: int, end: int) -> list:
-        return list(msgpack.Unpacker(BytesIO(self._readb(start, end))))
+        return runs
+
+    def _prefetch(self, items: list | range) -> None:
+        """
+        Loads the groups holding the given items, groups adjacent in the file are read in one go.
+        Only lists of small objects with caching enabled are affected.
+        """
+        if not self._cached or self._toc is not None:
+            return
+
+        groups: set = set()
+        for item in items:
+            if -self._len <= item < self._len:
+                groups.add(self._lookup_index(item % self._len))
+
+        for num_start, num_end, start, end in self._coalesce(sorted(groups)):
+            self._mask[num_start:num_end] = 1
+            self._cache[num_start:num_end] = self._all(start, end, num_end - num_start)
 
     def __getitem__(self, index):
-        index_range: list | range
         if isinstance(index, str):
             try:
-                index_range = [int(index)]
+                index = int(index)
             except ValueError:
                 raise TypeError(f"Invalid type: {type(index)} for index {index}.")
-        elif isinstance(index, slice):
-            index_range = range(*index.indices(len(self)))
-        elif isinstance(index, int):
-            index_range = [index]
-        else:
+
+        if isinstance(index, int):
+            item: int = index + self._len if index < 0 else index
+            if not 0 <= item < self._len:
+                raise IndexError(f"Index {index} out of range.")
+
+            if self._cached:
+                if 0 == self._mask[item]:
+                    self._fetch(item)
+                return self._cache[item]
+
+            if self._toc is not None:
+                return self._child(self._toc[item])
+
+            lookup_index: int = self._lookup_index(item)
+            size, start, end = self._pos[lookup_index]
+            return self._all(start, end, size)[item - self._size_list[lookup_index]]
+
+        if not isinstance(index, slice):
             raise TypeError(f"Invalid type: {type(index)} for index {index}.")
 
+        index_range: range = range(*index.indices(self._len))
+
         if self._cached:
+            # groups of small objects covered by the slice are read in as few runs as possible
+            self._prefetch(index_range)
             for item in index_range:
-                item = normalise_index(item, len(self))
-
                 if 0 == self._mask[item]:
-                    if self._toc is not None:
-                        self._mask[item] = 1
-                        self._cache[item] = self._child(self._toc[item])
-                    else:
-                        lookup_index: int = self._lookup_index(item)
-                        num_start, num_end = (
-                            self._size_list[lookup_index],
-                            self._size_list[lookup_index + 1],
-                        )
-                        self._mask[num_start:num_end] = 1
-                        self._cache[num_start:num_end] = self._all(
-                            *self._pos[lookup_index][1:]
-                        )
+                    self._fetch(item)
 
             return self._cache[index]
 
-        for item in index_range:
-            item = normalise_index(item, len(self))
-
-            if self._toc is not None:
+        if self._toc is not None:
+            for item in index_range:
                 self._cache[item] = self._child(self._toc[item])
-            else:
-                lookup_index = self._lookup_index(item)
-                num_start, num_end = (
-                    self._size_list[lookup_index],
-                    self._size_list[lookup_index + 1],
+        else:
+            groups: set = {self._lookup_index(item) for item in index_range}
+            for num_start, num_end, start, end in self._coalesce(sorted(groups)):
+                self._cache[num_start:num_end] = self._all(
+                    start, end, num_end - num_start
                 )
-                self._cache[num_start:num_end] = self._all(*self._pos[lookup_index][1:])
 
         result = self._cache[index]
-        self._cache = [None] * len(self)
+        self._cache = [None] * self._len
         return result
 
     def __iter__(self):
@@ -310,11 +431,7 @@ class LazyList(LazyItem):
         return item
 
     def __len__(self):
-        return (
-            self._toc.__len__()
-            if self._toc is not None
-            else sum(x[0] for x in self._pos)
-        )
+        return self._len
 
     def to_obj(self):
         """
@@ -327,8 +444,8 @@ class LazyList(LazyItem):
                 return self._read(*self._pos)
 
             result: list = []
-            for _, start, end in self._pos:
-                result.extend(self._all(start, end))
+            for num_start, num_end, start, end in self._coalesce():
+                result.extend(self._all(start, end, num_end - num_start))
 
             return result
 
@@ -340,12 +457,10 @@ class LazyList(LazyItem):
             elif self._toc is not None:
                 self._cache = self._read(*self._pos)
             else:
-                num_start, num_end = 0, 0
-                for size, start, end in self._pos:
-                    num_end += size
-                    if 0 == self._mask[num_start]:
-                        self._cache[num_start:num_end] = self._all(start, end)
-                    num_start = num_end
+                for num_start, num_end, start, end in self._coalesce():
+                    self._cache[num_start:num_end] = self._all(
+                        start, end, num_end - num_start
+                    )
 
             self._mask.setall(1)
 
@@ -355,7 +470,7 @@ class LazyList(LazyItem):
 class LazyDict(LazyItem):
     def __init__(
         self,
-        toc: dict,
+        toc: dict | list,
         buffer: BufferReader,
         offset: int,
         *,
@@ -366,8 +481,9 @@ class LazyDict(LazyItem):
         super().__init__(
             buffer, offset, counter=counter, cached=cached, unpacker=unpacker
         )
-        self._toc: dict = toc["t"]
-        self._pos: list = toc.get("p", None)  # noqa # if empty, it comes from a combined archive
+        self._toc: dict
+        self._pos: list | None  # if None, it comes from a combined archive
+        self._toc, self._pos, _ = parse_node(toc)
         self._cache: dict = {}
         self._full_loaded: bool = False
 
@@ -382,10 +498,17 @@ class LazyDict(LazyItem):
         if not self._cached:
             return self._child(self._toc[key])
 
-        if key not in self._cache:
-            self._cache[key] = self._child(self._toc[key])
+        if (value := self._cache.get(key, _missing)) is _missing:
+            value = self._cache[key] = self._child(self._toc[key])
 
-        return self._cache[key]
+        return value
+
+    def __eq__(self, other):
+        # keys are known from the TOC, compare them before reading any value
+        if isinstance(other, (dict, LazyDict)) and self.keys() != other.keys():
+            return False
+
+        return super().__eq__(other)
 
     def __contains__(self, item):
         return item in self._toc
@@ -473,27 +596,32 @@ class LazyReader(LazyItem):
         :param unpacker: the unpacker object for reading the data
         """
         self._buffer_or_path: str | BufferReader = buffer_or_path
+        # files opened from a path are owned and closed by this object
+        self._owns_buffer: bool = isinstance(buffer_or_path, str)
 
         buffer: BufferReader
-        if isinstance(self._buffer_or_path, str):
-            buffer = open(self._buffer_or_path, "rb", buffering=config.read_buffer_size)
-        elif isinstance(self._buffer_or_path, (BytesIO, BufferedReader, MockIO)):
+        if self._owns_buffer:
+            buffer = _open_mapped(self._buffer_or_path)
+        elif isinstance(
+            self._buffer_or_path, (BytesIO, BufferedReader, MockIO, mmap.mmap)
+        ):
             buffer = self._buffer_or_path
         else:
             raise ValueError("Expecting a buffer or path.")
 
-        sep_a, sep_b, sep_c = (
-            LazyWriter.magic_len(),
-            LazyWriter.magic_len() + 10,
-            LazyWriter.magic_len() + 20,
-        )
+        sep_a: int = LazyWriter.magic_len()
+        sep_c: int = sep_a + 20
 
         # keep the buffer unchanged in case of failure
+        # the header is read together with the following block
+        # so that the TOC of small archives is available without a second round-trip
         original_pos: int = buffer.tell()
-        header: bytes = buffer.read(sep_c)
+        header: bytes = buffer.read(
+            sep_c + min(_toc_prefetch_size, config.read_buffer_size)
+        )
         buffer.seek(original_pos)
 
-        if header[:sep_a] != LazyWriter.magic:
+        if not LazyWriter.is_magic(header[:sep_a]):
             raise ValueError("Invalid file format.")
 
         super().__init__(
@@ -504,10 +632,15 @@ class LazyReader(LazyItem):
             unpacker=unpacker,
         )
 
-        toc_start: int = self._unpack(header[sep_a:sep_b].lstrip(b"\0"))
-        toc_size: int = self._unpack(header[sep_b:sep_c].lstrip(b"\0"))
+        toc_start, toc_size = unpack_header(header, sep_a)
 
-        self._obj = self._child(self._read(toc_start, toc_start + toc_size))
+        toc_end: int = sep_c + toc_start + toc_size
+        if toc_end <= len(header):
+            if self._counter:
+                self._counter += toc_size
+            self._obj = self._child(self._unpack(header[sep_c + toc_start : toc_end]))
+        else:
+            self._obj = self._child(self._read(toc_start, toc_start + toc_size))
 
     def __repr__(self):
         file_path: str = ""
@@ -528,7 +661,7 @@ class LazyReader(LazyItem):
     def __exit__(self, exc_type, exc_val, exc_tb):
         decrement_gc_counter()
 
-        if isinstance(self._buffer_or_path, str):
+        if self._owns_buffer:
             self._buffer.close()
 
     def __getitem__(self, item):
@@ -579,18 +712,8 @@ class LazyReader(LazyItem):
         :return: The data at the given path.
         """
 
-        path_stack: list
-        if path is None:
-            path_stack = []
-        elif isinstance(path, str):
-            path_stack = path.split("/")
-        elif isinstance(path, list):
-            path_stack = path
-        else:
-            path_stack = [path]
-
         target = self._obj
-        for key in (v for v in path_stack if v != ""):
+        for key in _split_path(path):
             target = target[
                 to_index(key, len(target))
                 if isinstance(key, str) and isinstance(target, (list, LazyList))
@@ -598,6 +721,34 @@ class LazyReader(LazyItem):
             ]
         return target
 
+    def read_many(self, paths: list) -> list:
+        """
+        Reads the data from the given paths, see `read` for the format of each path.
+
+        Items in lists of small objects are loaded group by group, groups that are adjacent
+        in the file are read in one go instead of one read per item.
+        The results are returned in the same order as the paths.
+
+        :param paths: a list of paths to the data to read
+        :return: a list of the data at the given paths
+        """
+        items: dict = {}
+        for path in paths:
+            *parent, key = _split_path(path) or [None]
+            if isinstance(key, str):
+                try:
+                    key = int(key)
+                except ValueError:
+                    continue
+            if isinstance(key, int) and all(isinstance(v, (str, int)) for v in parent):
+                items.setdefault(tuple(parent), []).append(key)
+
+        for parent, keys in items.items():
+            if isinstance(target := self.read(list(parent)), LazyList):
+                target._prefetch(keys)
+
+        return [self.read(path) for path in paths]
+
     def visit(self, path: str = ""):
         """
         Reads the data from the given path.
@@ -611,7 +762,7 @@ class LazyReader(LazyItem):
         :return: The data at the given path.
         """
         target = self._obj
-        for key in (v for v in path.split("/") if v != ""):
+        for key in _split_str(path):
             target = target[
                 to_index(key, len(target))
                 if isinstance(target, (list, LazyList))
@@ -634,18 +785,8 @@ class LazyReader(LazyItem):
         :return: The data at the given path.
         """
 
-        path_stack: list
-        if path is None:
-            path_stack = []
-        elif isinstance(path, str):
-            path_stack = path.split("/")
-        elif isinstance(path, list):
-            path_stack = path
-        else:
-            path_stack = [path]
-
         target = self._obj
-        for key in (v for v in path_stack if v != ""):
+        for key in _split_path(path):
             target = await async_get(
                 target,
                 to_index(key, len(target))
@@ -667,7 +808,7 @@ class LazyReader(LazyItem):
         :return: The data at the given path.
         """
         target = self._obj
-        for key in (v for v in path.split("/") if v != ""):
+        for key in _split_str(path):
             target = await async_get(
                 target,
                 to_index(key, len(target))
@@ -15,7 +15,6 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
 from io import BytesIO
 from typing import BinaryIO
 
@@ -30,12 +29,31 @@ try:
 except ImportError:
     ndarray = list  # type: ignore
 
+_containers: tuple = (dict, list, set, tuple, ndarray)
+# exact types of common leaves, a set lookup rules them out before the slower isinstance check
+_scalars: frozenset = frozenset((int, float, str, bytes, bool, type(None)))
 
-@dataclass()
-class Node:
-    t: dict | list | None
-    p: dict | list
-    s: bool = False
+# size of a packed double: one type byte and eight bytes of payload
+_float_size: int = 9
+
+
+def parse_node(node: dict | list) -> tuple:
+    """
+    Splits a TOC node into its `(t, p, k)` components.
+
+    Nodes are written as compact arrays `[t, p]` or `[t, p, k]`.
+    Archives written by earlier versions use mappings `{"t": t, "p": p, "k": k}` with absent keys omitted.
+    Both layouts are accepted.
+    """
+    if isinstance(node, dict):
+        return node.get("t", None), node.get("p", None), node.get("k", None)
+
+    size: int = len(node)
+    return (
+        node[0],
+        node[1] if size > 1 else None,
+        node[2] if size > 2 else None,
+    )
 
 
 class TOC:
@@ -44,92 +62,241 @@ class TOC:
     ):  # type: ignore
         self._buffer: BytesIO | BinaryIO = buffer
         self._packer: Packer = packer
-        self._initial_pos = self._buffer.tell()
+        # packed bytes are staged in a bytearray and flushed to the buffer in large chunks
+        self._staging: bytearray = bytearray()
+        self._flushed: int = 0
+        # None means identity, checked in place to skip one call per container
+        self._transform: callable | None = transform  # type: ignore
 
-        def plain_forward(obj):
-            return obj
-
-        self._transform: callable = transform if transform else plain_forward  # type: ignore
+    def _flush(self) -> None:
+        # raw file objects may accept only part of the data per call
+        with memoryview(self._staging) as view:
+            while view:
+                view = view[self._buffer.write(view) :]
+        self._flushed += len(self._staging)
+        self._staging = bytearray()
 
     @property
-    def _pos(self) -> int:
-        return self._buffer.tell() - self._initial_pos
-
-    def _pack(self, obj) -> Node:
-        def _pack_bin(_obj: bytes) -> None:
-            self._buffer.write(_obj)
-
-        def _pack_obj(_obj) -> None:
-            self._buffer.write(self._packer.pack(_obj))
-
-        def _generate(_start: int) -> Node:
-            _end = self._pos
-            return Node(None, [_start, _end], _end <= _start + config.trivial_size)
-
-        if not isinstance(obj, (dict, list, set, tuple, ndarray)):
-            start_pos = self._pos
-            _pack_obj(obj)
-            return _generate(start_pos)
-
-        if isinstance(obj, tuple):
-            obj = list(obj)
-        elif isinstance(obj, set):
-            obj = sorted(obj)
-        elif ndarray is not list and isinstance(obj, ndarray):
-            if config.numpy_encoder:
-                start_pos = self._pos
-                _pack_obj(obj.dumps())
-                return _generate(start_pos)
+    def written(self) -> int:
+        """
+        The number of bytes written to the buffer so far, staged bytes included.
+        """
+        return self._flushed + len(self._staging)
+
+    # each packed node is a tuple (t, p, s, k)
+    # t: the toc of children, p: the position, s: if the node is small, k: the kind of leaf
+    def _pack(self, obj) -> tuple:
+        # settings and bound methods are resolved once, the recursion only touches locals
+        trivial_size: int = config.trivial_size
+        threshold: int = config.small_obj_optimization_threshold
+        numpy_encoder: bool = config.numpy_encoder
+        deterministic_sets: bool = config.deterministic_sets
+        transform = self._transform
+        pack = self._packer.pack
+        pack_map_header = self._packer.pack_map_header
+        pack_array_header = self._packer.pack_array_header
+        flush = self._flush
+        write_buffer_size: int = config.write_buffer_size
+        # floats are written as 0xcb followed by a big-endian double, the same bytes the packer produces
+        # float arrays are then encoded in bulk without boxing each element
+        float_fast_path: bool = (
+            ndarray is not list
+            and transform is None
+            and _float_size <= trivial_size
+            and pack(0.5)[:1] == b"\xcb"
+        )
+
+        # packers providing `encode_into` write straight into the staging buffer
+        encode_into = getattr(self._packer, "encode_into", None)
+
+        def _pos() -> int:
+            return self._flushed + len(self._staging)
+
+        def write(_data) -> None:
+            staging = self._staging
+            staging += _data
+            if len(staging) >= write_buffer_size:
+                flush()
+
+        if encode_into is None:
+
+            def write_obj(_obj) -> None:
+                write(pack(_obj))
 
-            obj = obj.tolist()
-
-        start_pos = self._pos
-
-        obj_toc: dict | list
-        all_small_obj: bool
-        if isinstance(obj, dict):
-            _pack_bin(self._packer.pack_map_header(len(obj)))
-            obj_toc = {}
-            for k, v in self._transform(obj.items()):  # type: ignore
-                _pack_obj(k)
-                obj_toc[k] = self._pack(v)
-            all_small_obj = all(v.s for v in obj_toc.values())
-        elif isinstance(obj, list):
-            _pack_bin(self._packer.pack_array_header(len(obj)))
-            obj_toc = [self._pack(v) for v in self._transform(obj)]  # type: ignore
-            all_small_obj = all(v.s for v in obj_toc)
         else:
-            raise ValueError(f"Expecting dict or list, got {obj.__class__}.")
 
-        if self._pos < start_pos + config.small_obj_optimization_threshold:
-            return _generate(start_pos)
+            def write_obj(_obj) -> None:
+                staging = self._staging
+                encode_into(_obj, staging)
+                if len(staging) >= write_buffer_size:
+                    flush()
+
+        def _generate(_start: int, _kind: str | None = None) -> tuple:
+            _end = _pos()
+            return None, [_start, _end], _end <= _start + trivial_size, _kind
+
+        def _pack_float_array(_obj) -> tuple:
+            size: int = len(_obj)
+            start_pos = _pos()
+            write(pack_array_header(size))
+            data_start = _pos()
+
+            encoded = numpy.empty((size, _float_size), dtype=numpy.uint8)
+            encoded[:, 0] = 0xCB
+            encoded[:, 1:] = _obj.astype(">f8").view(numpy.uint8).reshape(size, 8)
+            write(encoded.data)
+
+            if 0 == size or _pos() < start_pos + threshold:
+                return _generate(start_pos)
+
+            # same grouping as the generic path, a group closes once it exceeds the threshold
+            step: int = threshold // _float_size + 1
+            groups: list = [
+                (
+                    min(step, size - i),
+                    data_start + i * _float_size,
+                    data_start + min(i + step, size) * _float_size,
+                )
+                for i in range(0, size, step)
+            ]
 
-        if all_small_obj:
-            if isinstance(obj, dict) or 0 == len(obj):
+            return (
+                (None, groups, False, None) if len(groups) > 1 else _generate(start_pos)
+            )
+
+        def _pack_inner(_obj) -> tuple:
+            if type(_obj) in _scalars or not isinstance(_obj, _containers):
+                start_pos = _pos()
+                write_obj(_obj)
                 return _generate(start_pos)
 
-            groups: list = []
-            accu_list: list = []
-            accu_size: int = 0
-            for v in obj_toc:
-                accu_list.append(v)
-                accu_size += v.p[1] - v.p[0]
-                if accu_size > config.small_obj_optimization_threshold:
-                    groups.append(
-                        (len(accu_list), accu_list[0].p[0], accu_list[-1].p[1])
+            # tuples are packed as lists without being copied
+            if isinstance(_obj, set):
+                _obj = sorted(_obj) if deterministic_sets else list(_obj)
+            elif ndarray is not list and isinstance(_obj, ndarray):
+                if numpy_encoder:
+                    start_pos = _pos()
+                    if _obj.dtype.hasobject or _obj.dtype.fields is not None:
+                        write_obj(_obj.dumps())
+                        return _generate(start_pos, "np")
+
+                    # plain dtypes are stored as [dtype, shape, raw bytes] without pickling
+                    write_obj(
+                        [
+                            _obj.dtype.str,
+                            list(_obj.shape),
+                            memoryview(
+                                numpy.ascontiguousarray(_obj)
+                                .reshape(-1)
+                                .view(numpy.uint8)
+                            ),
+                        ]
+                    )
+                    return _generate(start_pos, "nd")
+
+                if _obj.ndim > 1:
+                    _obj = list(_obj)
+                elif (
+                    float_fast_path
+                    and 1 == _obj.ndim
+                    and "f" == _obj.dtype.kind
+                    and _obj.dtype.itemsize <= 8
+                ):
+                    return _pack_float_array(_obj)
+                else:
+                    _obj = _obj.tolist()
+
+            start_pos = _pos()
+
+            obj_toc: dict | list
+            # accumulated while packing the children, no second pass over them
+            all_small_obj: bool = True
+            if isinstance(_obj, dict):
+                write(pack_map_header(len(_obj)))
+                obj_toc = {}
+                items = _obj.items()
+                if transform is not None:
+                    items = transform(items)
+                for k, v in items:
+                    write_obj(k)
+                    obj_toc[k] = child = _pack_inner(v)
+                    all_small_obj = all_small_obj and child[2]
+            elif isinstance(_obj, (list, tuple)):
+                write(pack_array_header(len(_obj)))
+                if (
+                    transform is None
+                    and encode_into is None
+                    and all(
+                        type(v) in _scalars or not isinstance(v, _containers)
+                        for v in _obj
                     )
-                    accu_list = []
-                    accu_size = 0
+                ):
+                    # a list of scalars is packed in one go and written with a single call
+                    packed: list = [pack(v) for v in _obj]
+                    obj_toc = []
+                    v_end: int = _pos()
+                    for v in packed:
+                        v_start, v_end = v_end, v_end + len(v)
+                        v_small: bool = v_end <= v_start + trivial_size
+                        obj_toc.append((None, [v_start, v_end], v_small, None))
+                        all_small_obj = all_small_obj and v_small
+                    write(b"".join(packed))
+                else:
+                    obj_toc = []
+                    for v in _obj if transform is None else transform(_obj):
+                        obj_toc.append(child := _pack_inner(v))
+                        all_small_obj = all_small_obj and child[2]
+            else:
+                raise ValueError(f"Expecting dict or list, got {_obj.__class__}.")
+
+            if _pos() < start_pos + threshold:
+                return _generate(start_pos)
+
+            if all_small_obj:
+                if isinstance(_obj, dict) or 0 == len(_obj):
+                    return _generate(start_pos)
+
+                groups: list = []
+                accu_size: int = 0
+                accu_count: int = 0
+                accu_start: int = 0
+                for _, (v_start, v_end), _, _ in obj_toc:
+                    if 0 == accu_count:
+                        accu_start = v_start
+                    accu_count += 1
+                    accu_size += v_end - v_start
+                    if accu_size > threshold:
+                        groups.append((accu_count, accu_start, v_end))
+                        accu_count = 0
+                        accu_size = 0
+
+                if accu_count:
+                    groups.append((accu_count, accu_start, obj_toc[-1][1][1]))
+
+                return (
+                    (None, groups, False, None)
+                    if len(groups) > 1
+                    else _generate(start_pos)
+                )
+
+            return obj_toc, [start_pos, _pos()], False, None
+
+        return _pack_inner(obj)
 
-            if accu_list:
-                groups.append((len(accu_list), accu_list[0].p[0], accu_list[-1].p[1]))
+    def pack(self, obj) -> list:
+        def _convert(_node: tuple) -> list:
+            _toc, _pos, _, _kind = _node
+            if isinstance(_toc, dict):
+                _toc = {k: _convert(v) for k, v in _toc.items()}
+            elif isinstance(_toc, list):
+                _toc = [_convert(v) for v in _toc]
 
-            return Node(None, groups) if len(groups) > 1 else _generate(start_pos)
+            if _kind is None:
+                return [_toc, _pos]
 
-        return Node(obj_toc, [start_pos, self._pos])
+            return [_toc, _pos, _kind]
 
-    def pack(self, obj) -> dict:
-        def _factory(_obj) -> dict:
-            return {k: v for k, v in _obj if v and k != "s"}
+        root: tuple = self._pack(obj)
+        self._flush()
 
-        return asdict(self._pack(obj), dict_factory=_factory)
+        return _convert(root)
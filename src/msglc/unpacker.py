@@ -13,7 +13,11 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from __future__ import annotations
+
 from abc import abstractmethod
+from typing import Union
+
 import msgpack
 
 
@@ -41,9 +45,30 @@ try:
 
         def decode(self, data):
             return self._unpacker.decode(data)
+
+    # the TOC of a combined archive in the current layout: [[offset, ...] or {name: offset, ...}, None]
+    _combined_toc = msgspec.msgpack.Decoder(
+        tuple[Union[list[int], dict[str, int]], None]
+    )
+
+    def unpack_combined_toc(data: bytes) -> list | dict | None:
+        """
+        Decodes and validates the TOC of a combined archive in one pass.
+
+        Returns `None` if the data does not match, the caller then falls back to the generic path.
+        """
+        try:
+            return _combined_toc.decode(data)[0]
+        except msgspec.DecodeError:
+            return None
+
 except ImportError:
     MsgspecUnpacker = MsgpackUnpacker
 
+    def unpack_combined_toc(data: bytes) -> list | dict | None:
+        return None
+
+
 try:
     import ormsgpack
 
@@ -52,11 +52,14 @@ class MockIO:
         return self._io.tell()
 
     def seek(self, offset: int):
-        sleep(self._seek_delay)
+        # sleep(0) still yields to the scheduler, skip it when there is nothing to wait for
+        if self._seek_delay > 0:
+            sleep(self._seek_delay)
         self._io.seek(offset)
 
     def read(self, size: int):
-        sleep(size / self._actual_speed(size))
+        if (delay := size / self._actual_speed(size)) > 0:
+            sleep(delay)
         return self._io.read(size)
 
     def close(self):
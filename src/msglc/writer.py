@@ -16,10 +16,12 @@
 from __future__ import annotations
 
 import os.path
+import shutil
+import struct
 from io import BytesIO, BufferedReader
-from typing import Generator, Literal
+from typing import BinaryIO, Generator, Literal
 
-from msgpack import Packer, packb, unpackb  # type: ignore
+from msgpack import Packer, unpackb  # type: ignore
 
 from .config import (
     config,
@@ -28,62 +30,203 @@ from .config import (
     BufferWriter,
     max_magic_len,
 )
-from .toc import TOC
+from .packer import pack_toc
+from .toc import TOC, parse_node
+from .unpacker import unpack_combined_toc
+
+
+# each header field takes 10 bytes, a zero pad followed by a msgpack uint64
+# this decodes the same way as the zero-padded compact integers written by earlier versions
+_header: struct.Struct = struct.Struct(">xBQxBQ")
+# placeholder written on open, filled in once the TOC position is known
+_empty_header: bytes = bytes(_header.size)
+
+
+def pack_header(toc_start: int, toc_size: int) -> bytes:
+    """
+    Packs the start and the size of the TOC into the 20-byte header.
+    """
+    return _header.pack(0xCF, toc_start, 0xCF, toc_size)
+
+
+def unpack_header(header: bytes, offset: int) -> tuple[int, int]:
+    """
+    Unpacks the start and the size of the TOC from the 20-byte header at the given offset.
+
+    Headers written by earlier versions hold zero-padded compact integers and are decoded generically.
+    """
+    start_tag, toc_start, size_tag, toc_size = _header.unpack_from(header, offset)
+    if start_tag == size_tag == 0xCF:
+        return toc_start, toc_size
+
+    return (
+        unpackb(header[offset : offset + 10].lstrip(b"\0")),
+        unpackb(header[offset + 10 : offset + 20].lstrip(b"\0")),
+    )
+
+
+def _write_all(buffer: BufferWriter, data: bytes) -> None:
+    """
+    Writes all the given bytes to the buffer.
+
+    Unbuffered files may accept only part of the data per call, the rest is written in further calls.
+    """
+    with memoryview(data) as view:
+        while view:
+            view = view[buffer.write(view) :]
+
+
+def _pwrite_all(fd: int, data: bytes, offset: int) -> None:
+    """
+    Writes all the given bytes to the file descriptor at the given offset, without moving the file position.
+    """
+    with memoryview(data) as view:
+        while view:
+            written: int = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+
+
+def _preallocate(file: BufferWriter, size: int | None) -> bool:
+    """
+    Reserves disk space for a file about to be written, so that it can be allocated in one go.
+
+    Returns `True` if the space has been reserved, the file then needs to be truncated to its final size.
+    """
+    if not size or not hasattr(os, "posix_fallocate"):
+        return False
+
+    try:
+        os.posix_fallocate(file.fileno(), 0, size)
+    except OSError:
+        return False
+
+    return True
+
+
+def _sendfile(source: BinaryIO, target: BufferWriter) -> int | None:
+    """
+    Copies the rest of the source file to the target file within the kernel, skipping user-space buffers.
+
+    Returns the number of bytes copied, or `None` if either side is not backed by a file or the platform does not support it.
+    The positions of both files are advanced past the copied data.
+    """
+    if not hasattr(os, "sendfile"):
+        return None
+
+    try:
+        source_fd: int = source.fileno()
+        target_fd: int = target.fileno()
+    except (AttributeError, OSError):
+        return None
+
+    offset: int = source.tell()
+    target.flush()
+    position: int = target.tell()
+
+    copied: int = 0
+    while True:
+        try:
+            sent: int = os.sendfile(
+                target_fd, source_fd, offset + copied, config.copy_chunk_size
+            )
+        except OSError:
+            # nothing is copied yet, leave it to the user-space copy
+            if copied == 0:
+                return None
+            raise
+        if sent == 0:
+            break
+        copied += sent
+
+    source.seek(offset + copied)
+    # resynchronise the buffered position with the file descriptor
+    target.seek(position + copied)
+
+    return copied
 
 
 class LazyWriter:
-    magic: bytes = b"msglc-2024".rjust(max_magic_len, b"\0")
+    # the TOC is stored as arrays since msglc-2025, archives tagged with msglc-2024 use mappings
+    magic: bytes = b"msglc-2025".rjust(max_magic_len, b"\0")
+    legacy_magic: bytes = b"msglc-2024".rjust(max_magic_len, b"\0")
 
     @classmethod
     def magic_len(cls) -> int:
         return len(cls.magic)
 
+    @classmethod
+    def is_magic(cls, magic: bytes) -> bool:
+        """
+        Checks if the given bytes identify a readable archive, either the current or the legacy format.
+        """
+        return magic == cls.magic or magic == cls.legacy_magic
+
     @classmethod
     def set_magic(cls, magic: bytes):
         cls.magic = magic.rjust(max_magic_len, b"\0")
 
-    def __init__(self, buffer_or_path: str | BufferWriter, packer: Packer = None):
+    def __init__(
+        self,
+        buffer_or_path: str | BufferWriter,
+        packer: Packer = None,
+        *,
+        expected_size: int | None = None,
+    ):
         """
         It is possible to provide a custom packer object to be used for packing the object.
         However, this packer must be compatible with the `msgpack` packer.
 
+        If the target is a file path, an expected size (in bytes) can be given as a hint.
+        The space is then reserved upfront where the platform supports it.
+        The file is truncated to its actual size on exit.
+
         :param buffer_or_path: target buffer or file path
         :param packer: packer object to be used for packing the object
+        :param expected_size: expected size of the file
         """
         self._buffer_or_path: str | BufferWriter = buffer_or_path
+        # files opened from a path are owned and closed by this object
+        self._owns_buffer: bool = isinstance(buffer_or_path, str)
         self._packer = packer if packer else Packer()
+        # the default TOC encoder is only equivalent to the default packer
+        # a custom packer may carry options, such as `default`, that keys in the TOC rely on
+        self._pack_toc = pack_toc if not packer else self._packer.pack
+        self._expected_size: int | None = expected_size
+        self._preallocated: bool = False
 
         self._buffer: BufferWriter = None  # type: ignore
         self._toc_packer: TOC = None  # type: ignore
         self._header_start: int = 0
         self._file_start: int = 0
+        self._file_end: int = 0
         self._no_more_writes: bool = False
 
     def __enter__(self):
         increment_gc_counter()
 
-        if isinstance(self._buffer_or_path, str):
-            self._buffer = open(
-                self._buffer_or_path, "wb", buffering=config.write_buffer_size
-            )
+        if self._owns_buffer:
+            # the TOC packer stages writes in chunks of `write_buffer_size` already, skip another buffer layer
+            self._buffer = open(self._buffer_or_path, "wb", buffering=0)
+            self._preallocated = _preallocate(self._buffer, self._expected_size)
         elif isinstance(self._buffer_or_path, (BytesIO, BufferedReader)):
             self._buffer = self._buffer_or_path
         else:
             raise ValueError("Expecting a buffer or path.")
 
-        self._buffer.write(self.magic)
-        self._header_start = self._buffer.tell()
-        self._buffer.write(b"\0" * 20)
-        self._file_start = self._buffer.tell()
-
-        self._toc_packer = TOC(packer=self._packer, buffer=self._buffer)
+        self._file_start = self._buffer.tell() + len(self.magic) + len(_empty_header)
+        self._header_start = self._file_start - len(_empty_header)
+        _write_all(self._buffer, self.magic + _empty_header)
+        self._file_end = self._file_start
 
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         decrement_gc_counter()
 
-        if isinstance(self._buffer_or_path, str):
+        if self._owns_buffer:
+            if self._preallocated:
+                self._buffer.truncate(self._file_end)
             self._buffer.close()
 
     def write(self, obj) -> None:
@@ -101,39 +244,62 @@ class LazyWriter:
 
         self._no_more_writes = True
 
-        toc: dict = self._toc_packer.pack(obj)
-        toc_start: int = self._buffer.tell() - self._file_start
-        packed_toc: bytes = self._packer.pack(toc)
-
-        self._buffer.write(packed_toc)
-        self._buffer.seek(self._header_start)
-        self._buffer.write(self._packer.pack(toc_start).rjust(10, b"\0"))
-        self._buffer.write(self._packer.pack(len(packed_toc)).rjust(10, b"\0"))
+        # the packer is only needed once an object is actually written
+        self._toc_packer = TOC(packer=self._packer, buffer=self._buffer)
+        toc: list = self._toc_packer.pack(obj)
+        # the packer counts the bytes it has written, no need to query the buffer
+        toc_start: int = self._toc_packer.written
+        packed_toc: bytes = self._pack_toc(toc)
+
+        _write_all(self._buffer, packed_toc)
+        self._file_end = self._file_start + toc_start + len(packed_toc)
+        header: bytes = pack_header(toc_start, len(packed_toc))
+        if self._owns_buffer and hasattr(os, "pwrite"):
+            # the file is unbuffered, the header is written in place without moving the position
+            _pwrite_all(self._buffer.fileno(), header, self._header_start)
+        else:
+            self._buffer.seek(self._header_start)
+            _write_all(self._buffer, header)
 
 
 class LazyCombiner:
     def __init__(
-        self, buffer_or_path: str | BufferWriter, *, mode: Literal["a", "w"] = "w"
+        self,
+        buffer_or_path: str | BufferWriter,
+        *,
+        mode: Literal["a", "w"] = "w",
+        expected_size: int | None = None,
     ):
         """
         The mode resembles typical mode designations and implies the same meaning.
         If the mode is 'w', the file is overwritten.
         If the mode is 'a', the file is appended.
 
+        If the target is a file path, an expected size (in bytes) of the whole archive can be given as a hint.
+        The space is then reserved upfront where the platform supports it.
+        The file is truncated to its actual size on exit.
+
         :param buffer_or_path: target buffer or file path
         :param mode: mode of operation, 'w' for write and 'a' for append
+        :param expected_size: expected size of the file
         """
         self._buffer_or_path: str | BufferWriter = buffer_or_path
+        # files opened from a path are owned and closed by this object
+        self._owns_buffer: bool = isinstance(buffer_or_path, str)
         self._mode: str = mode
+        self._expected_size: int | None = expected_size
+        self._preallocated: bool = False
 
         self._buffer: BufferWriter = None  # type: ignore
 
         self._toc: dict | list = None  # type: ignore
         self._header_start: int = 0
         self._file_start: int = 0
+        # the current position relative to `_file_start`, tracked to avoid querying the buffer
+        self._pos: int = 0
 
     def __enter__(self):
-        if isinstance(self._buffer_or_path, str):
+        if self._owns_buffer:
             mode: str = (
                 "wb"
                 if not os.path.exists(self._buffer_or_path) or self._mode == "w"
@@ -150,16 +316,14 @@ class LazyCombiner:
             raise ValueError("Expecting a buffer or path.")
 
         if self._mode == "w":
-            self._buffer.write(LazyWriter.magic)
-            self._header_start = self._buffer.tell()
-            self._buffer.write(b"\0" * 20)
-            self._file_start = self._buffer.tell()
-        else:
-            sep_a, sep_b, sep_c = (
-                LazyWriter.magic_len(),
-                LazyWriter.magic_len() + 10,
-                LazyWriter.magic_len() + 20,
+            self._file_start = (
+                self._buffer.tell() + len(LazyWriter.magic) + len(_empty_header)
             )
+            self._header_start = self._file_start - len(_empty_header)
+            self._buffer.write(LazyWriter.magic + _empty_header)
+        else:
+            sep_a: int = LazyWriter.magic_len()
+            sep_c: int = sep_a + 20
 
             ini_position: int = self._buffer.tell()
             header: bytes = self._buffer.read(sep_c)
@@ -168,53 +332,65 @@ class LazyCombiner:
                 self._buffer.seek(ini_position)
                 raise ValueError(msg)
 
-            if header[:sep_a] != LazyWriter.magic:
+            if not LazyWriter.is_magic(header[:sep_a]):
                 _raise_invalid(
                     "Invalid file format, cannot append to the current file."
                 )
 
-            toc_start: int = unpackb(header[sep_a:sep_b].lstrip(b"\0"))
-            toc_size: int = unpackb(header[sep_b:sep_c].lstrip(b"\0"))
+            toc_start, toc_size = unpack_header(header, sep_a)
 
             self._buffer.seek(ini_position + sep_c + toc_start)
-            self._toc = unpackb(self._buffer.read(toc_size)).get("t", None)
-
-            if isinstance(self._toc, list):
-                if any(not isinstance(i, int) for i in self._toc):
+            packed_toc: bytes = self._buffer.read(toc_size)
+            # a well-formed TOC is decoded and validated in one go
+            # legacy layouts and invalid files go through the checks below
+            self._toc = unpack_combined_toc(packed_toc)  # type: ignore
+            if self._toc is None:
+                self._toc = parse_node(unpackb(packed_toc))[0]
+
+                if isinstance(self._toc, list):
+                    if any(not isinstance(i, int) for i in self._toc):
+                        _raise_invalid("The given file is not a valid combined file.")
+                elif isinstance(self._toc, dict):
+                    if any(not isinstance(i, int) for i in self._toc.values()):
+                        _raise_invalid("The given file is not a valid combined file.")
+                else:
                     _raise_invalid("The given file is not a valid combined file.")
-            elif isinstance(self._toc, dict):
-                if any(not isinstance(i, int) for i in self._toc.values()):
-                    _raise_invalid("The given file is not a valid combined file.")
-            else:
-                _raise_invalid("The given file is not a valid combined file.")
 
             self._header_start = ini_position + sep_a
             self._file_start = ini_position + sep_c
+            self._pos = toc_start
             self._buffer.seek(ini_position + sep_c + toc_start)
 
+        # only reserve space once an existing archive has been validated
+        if self._owns_buffer:
+            self._preallocated = _preallocate(self._buffer, self._expected_size)
+
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        toc_start: int = self._buffer.tell() - self._file_start
-        packed_toc: bytes = packb({"t": self._toc})
+        toc_start: int = self._pos
+        packed_toc: bytes = pack_toc([self._toc, None])
 
         self._buffer.write(packed_toc)
-        self._buffer.seek(self._header_start)
-        self._buffer.write(packb(toc_start).rjust(10, b"\0"))
-        self._buffer.write(packb(len(packed_toc)).rjust(10, b"\0"))
-
-        if isinstance(self._buffer_or_path, str):
+        file_end: int = self._file_start + toc_start + len(packed_toc)
+        # the TOC is always written in the current layout, a legacy archive is upgraded on append
+        self._buffer.seek(self._header_start - LazyWriter.magic_len())
+        self._buffer.write(LazyWriter.magic + pack_header(toc_start, len(packed_toc)))
+
+        if self._owns_buffer:
+            if self._preallocated:
+                self._buffer.truncate(file_end)
             self._buffer.close()
 
-    def write(self, obj: Generator, name: str | None = None) -> None:
+    def check(self, name: str | None = None) -> None:
         """
-        Write a number of objects to the file.
+        Checks if an object with the given name can be written to the archive, without writing anything.
 
-        :param obj: a generator of objects to be written to the file
         :param name: a name to be assigned to the object, only required when combining in dict mode
+        :raise ValueError: if the name does not fit the archive
         """
         if self._toc is None:
-            self._toc = [] if name is None else {}
+            return
 
         if name is None:
             if not isinstance(self._toc, list):
@@ -225,9 +401,48 @@ class LazyCombiner:
             if name in self._toc:
                 raise ValueError(f"File {name} already exists.")
 
-        start: int = self._buffer.tell() - self._file_start
-        for chunk in obj:
-            self._buffer.write(chunk)
+    def write(
+        self,
+        obj: Generator | BinaryIO | bytes | list | tuple,
+        name: str | None = None,
+    ) -> None:
+        """
+        Write a number of objects to the file.
+
+        A readable file object is copied over in chunks of `copy_chunk_size`.
+        A bytes-like object, or a list or tuple of them, is written in one go.
+
+        :param obj: a generator of objects, a readable file object, or bytes to be written to the file
+        :param name: a name to be assigned to the object, only required when combining in dict mode
+        """
+        self.check(name)
+
+        if self._toc is None:
+            self._toc = [] if name is None else {}
+
+        start: int = self._pos
+        if hasattr(obj, "read"):
+            copied: int | None = _sendfile(obj, self._buffer)
+            if copied is None:
+                shutil.copyfileobj(obj, self._buffer, config.copy_chunk_size)
+                # the copy does not report its size, query the buffer once per file
+                self._pos = self._buffer.tell() - self._file_start
+            else:
+                self._pos += copied
+        elif isinstance(obj, (bytes, bytearray, memoryview)):
+            self._pos += self._buffer.write(obj)
+        elif isinstance(obj, (list, tuple)):
+            # chunks already in memory are joined in C and written at once
+            self._pos += self._buffer.write(b"".join(obj))
+        else:
+            write = self._buffer.write
+            pos: int = self._pos
+            try:
+                for chunk in obj:
+                    pos += write(chunk)
+            finally:
+                # keep the position in sync even if the generator fails halfway
+                self._pos = pos
 
         if name is None:
             self._toc.append(start)
@@ -25,10 +25,15 @@ from msglc.reader import LazyDict, LazyList, LazyStats, LazyReader
 from msglc.unpacker import Unpacker
 
 
+_token_chars = (string.ascii_letters + string.digits).encode()
+# maps every byte onto the alphabet, so a token is one random draw and one translation
+_token_table = bytes.maketrans(
+    bytes(range(256)), bytes(_token_chars[i % len(_token_chars)] for i in range(256))
+)
+
+
 def generate_token():
-    return "".join(
-        random.choices(string.ascii_letters + string.digits, k=random.randint(5, 10))
-    )
+    return random.randbytes(random.randint(5, 10)).translate(_token_table).decode()
 
 
 def generate_deterministic_json(depth=10, width=4):
@@ -47,14 +52,18 @@ def generate_deterministic_json(depth=10, width=4):
 
 
 def generate_random_json(depth=10, width=4, simple=False):
-    seed = random.random()
+    _random = random.random
+    _choice = random.choice
+    _randint = random.randint
+
+    seed = _random()
 
     if depth == 0 or (simple and seed < 0.1):
-        return random.choice(
+        return _choice(
             [
-                random.randint(-(2**30), 2**30),
-                random.random(),
-                random.choice([True, False]),
+                _randint(-(2**30), 2**30),
+                _random(),
+                _choice([True, False]),
                 generate_token(),
             ]
         )
@@ -68,27 +77,26 @@ def generate_random_json(depth=10, width=4, simple=False):
     if seed < 0.95 or not simple:
         return [generate_random_json(depth - 1, width, True) for _ in range(width)]
 
-    return [random.randint(2**10, 2**30)] * random.randint(2**10, 2**14)
+    return [_randint(2**10, 2**30)] * _randint(2**10, 2**14)
 
 
-def find_all_paths(json_obj, path=None, path_list=None):
-    if path_list is None:
-        path_list = []
+_dict_types = (dict, LazyDict)
+_list_types = (list, LazyList)
 
-    if isinstance(json_obj, (dict, LazyDict)):
-        for key, value in json_obj.items():
-            new_path = [key] if not path else path + [key]
-            find_all_paths(value, new_path, path_list)
-        return path_list
 
-    if isinstance(json_obj, (list, LazyList)):
-        for index, value in enumerate(json_obj):
-            new_path = [index] if not path else path + [index]
-            find_all_paths(value, new_path, path_list)
-        return path_list
+def find_all_paths(json_obj):
+    path_list = []
 
-    if path:
-        path_list.append(path)
+    # children are pushed in reverse so that paths come out in the same order as a recursive walk
+    stack = [(json_obj, ())]
+    while stack:
+        obj, path = stack.pop()
+        if isinstance(obj, _dict_types):
+            stack.extend((v, path + (k,)) for k, v in reversed(list(obj.items())))
+        elif isinstance(obj, _list_types):
+            stack.extend((v, path + (i,)) for i, v in reversed(list(enumerate(obj))))
+        elif path:
+            path_list.append(list(path))
 
     return path_list
 
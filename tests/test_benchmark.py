@@ -29,12 +29,15 @@ from msglc.reader import LazyStats, LazyReader
 from msglc.unpacker import MsgpackUnpacker, MsgspecUnpacker
 
 
-def test_random_benchmark(monkeypatch, tmpdir):
+# shuffled paths give the worst case, ordered paths read siblings next to each other
+@pytest.mark.parametrize("shuffle", [True, False])
+def test_random_benchmark(monkeypatch, tmpdir, shuffle):
     monkeypatch.setattr(config, "small_obj_optimization_threshold", 8192)
 
     archive = {"id": generate_random_json(5, 10)}
     path = find_all_paths(archive)
-    random.shuffle(path)
+    if shuffle:
+        random.shuffle(path)
 
     with tmpdir.as_cwd():
         dump("archive.msg", archive)
@@ -73,32 +76,39 @@ def pack(array):
 
 
 def test_pack_large_array(tmpdir, benchmark):
+    # build the list once, the benchmark should only measure packing
+    array = [float(x) for x in range(20000)]
+
     def pack_large_array(_tmpdir):
         with _tmpdir.as_cwd():
-            pack([float(x) for x in range(20000)])
+            pack(array)
 
     benchmark(pack_large_array, tmpdir)
 
 
+@pytest.fixture(scope="module")
+def numpy_array():
+    numpy = pytest.importorskip("numpy")
+
+    # the array does not depend on the encoder, draw it once for all parameters
+    return numpy.random.default_rng(0).random((10, 11, 12000))
+
+
 @pytest.mark.parametrize("encoder", [True, False])
-def test_numpy_array(monkeypatch, tmpdir, encoder):
+def test_numpy_array(monkeypatch, tmpdir, encoder, numpy_array):
+    import numpy
+
     monkeypatch.setattr(config, "numpy_encoder", encoder)
 
-    try:
-        with tmpdir.as_cwd():
-            import numpy
-
-            numpy_array = numpy.random.random((10, 11, 12000))
-            pack(numpy_array)
-
-            with LazyReader("large_array.msg") as reader:
-                for _ in range(100000):
-                    x = random.randint(0, numpy_array.shape[0] - 1)
-                    y = random.randint(0, numpy_array.shape[1] - 1)
-                    z = random.randint(0, numpy_array.shape[2] - 1)
-                    assert reader["large_list"][x][y][z] == numpy_array[x][y][z]
-    except ImportError:
-        pass
+    with tmpdir.as_cwd():
+        pack(numpy_array)
+
+        # draw all indices in one go, the loop should only measure the reader
+        indices = numpy.random.randint(0, numpy_array.shape, size=(100000, 3))
+
+        with LazyReader("large_array.msg") as reader:
+            for x, y, z in indices.tolist():
+                assert reader["large_list"][x][y][z] == numpy_array[x][y][z]
 
 
 def test_compare_to_plain(tmpdir):
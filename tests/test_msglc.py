@@ -12,19 +12,23 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
 import random
 from io import BytesIO
 from itertools import cycle
 
 import pytest
+from msgpack import Packer, packb, unpackb
 
-from msglc import LazyWriter, FileInfo, combine, append
+from msglc import LazyWriter, LazyCombiner, FileInfo, combine, append
 from msglc.config import config, increment_gc_counter, decrement_gc_counter, configure
+from msglc.packer import MsgspecPacker, pack_toc
 from msglc.reader import LazyStats, LazyReader, async_to_obj
 from msglc.utility import MockIO
 
 
-@pytest.fixture(scope="function")
+# the sample documents are shared across the session, tests must not mutate them
+@pytest.fixture(scope="session")
 def json_base():
     return {
         "title": "example glossary",
@@ -50,7 +54,7 @@ def json_base():
     }
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def json_before(json_base):
     return {
         "glossary": json_base,
@@ -59,7 +63,7 @@ def json_before(json_base):
     }
 
 
-@pytest.fixture(scope="function")
+@pytest.fixture(scope="session")
 def json_after(json_base):
     return {
         "glossary": json_base,
@@ -84,6 +88,7 @@ def test_msglc(monkeypatch, tmpdir, json_before, json_after, target, size, cache
                 writer.write(json_before)
 
         stats = LazyStats()
+        assert stats.bytes_per_call() == 0.0
 
         if isinstance(target, BytesIO):
             target.seek(0)
@@ -200,10 +205,13 @@ def test_list_exception(monkeypatch, tmpdir, cached, threshold, trivial):
             with pytest.raises(TypeError):
                 print(reader["a:2:"])
 
-            assert reader[f"{-2-total_size}:"] == [198.0, 199.0]
-            assert reader[f"{2*total_size-2}:"] == [198.0, 199.0]
-            assert reader[f":{total_size+2}"] == [0.0, 1.0]
-            assert reader[f":{-2*total_size+2}"] == [0.0, 1.0]
+            assert reader[f"{-2 - total_size}:"] == [198.0, 199.0]
+            assert reader[f"{2 * total_size - 2}:"] == [198.0, 199.0]
+            # wrapping is constant time, no matter how far out of range
+            assert reader[f"{10**20 - 2}:"] == [198.0, 199.0]
+            assert reader[f":{-(10**20) + 1}"] == [0.0]
+            assert reader[f":{total_size + 2}"] == [0.0, 1.0]
+            assert reader[f":{-2 * total_size + 2}"] == [0.0, 1.0]
             assert reader[:2] == [0.0, 1.0]
 
             for _ in range(2 * total_size):
@@ -213,6 +221,116 @@ def test_list_exception(monkeypatch, tmpdir, cached, threshold, trivial):
             assert [float(x) for x in range(total_size)] == reader
 
 
+@pytest.mark.parametrize("cached", [True, False])
+def test_list_coalesced_reads(monkeypatch, tmpdir, cached):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 256)
+
+    total_size: int = 2000
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write({"data": [float(x) for x in range(total_size)]})
+
+        counter = LazyStats()
+        with LazyReader("test.msg", counter=counter, cached=cached) as reader:
+            target = reader["data"]
+            counter.clear()
+            assert target.to_obj() == [float(x) for x in range(total_size)]
+            assert str(counter).startswith("1 calls")
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_list_slice_coalesced_reads(monkeypatch, tmpdir, cached):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 256)
+
+    total_size: int = 2000
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write({"data": [float(x) for x in range(total_size)]})
+
+        counter = LazyStats()
+        with LazyReader("test.msg", counter=counter, cached=cached) as reader:
+            target = reader["data"]
+            counter.clear()
+            assert target[100:1500:3] == [float(x) for x in range(100, 1500, 3)]
+            assert str(counter).startswith("1 calls")
+
+
+def test_list_coalesced_reads_partially_loaded(monkeypatch, tmpdir):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 256)
+
+    total_size: int = 2000
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write({"data": [float(x) for x in range(total_size)]})
+
+        counter = LazyStats()
+        with LazyReader("test.msg", counter=counter) as reader:
+            target = reader["data"]
+            assert target[0] == 0.0
+            assert target[1000] == 1000.0
+            assert target[-1] == float(total_size - 1)
+            counter.clear()
+            # the loaded groups split the remaining ones into two runs
+            assert target.to_obj() == [float(x) for x in range(total_size)]
+            assert str(counter).startswith("2 calls")
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_read_many(monkeypatch, tmpdir, cached):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 256)
+
+    total_size: int = 2000
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write(
+                {"data": [float(x) for x in range(total_size)], "key": "value"}
+            )
+
+        indices = random.sample(range(total_size), 200)
+        paths = [f"data/{x}" for x in indices] + [["data", -1], "key", "data/1:3"]
+
+        counter = LazyStats()
+        with LazyReader("test.msg", counter=counter, cached=cached) as reader:
+            assert reader.read_many(paths) == [float(x) for x in indices] + [
+                float(total_size - 1),
+                "value",
+                [1.0, 2.0],
+            ]
+            if cached:
+                calls: int = int(str(counter).split()[0])
+                counter.clear()
+                # all groups are loaded, reading them again does not touch the file
+                assert reader.read_many(paths[:200]) == [float(x) for x in indices]
+                assert counter() == 0
+                assert calls < 200
+
+            with pytest.raises(IndexError):
+                reader.read_many(["data/0", f"data/{total_size}"])
+
+
+@pytest.mark.parametrize("threshold", [0, 256])
+@pytest.mark.parametrize("cached", [True, False])
+@pytest.mark.parametrize("total_size", [3, 1000])
+def test_list_index_bounds(monkeypatch, tmpdir, threshold, cached, total_size):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", threshold)
+
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write({"data": [float(x) for x in range(total_size)]})
+
+        with LazyReader("test.msg", cached=cached) as reader:
+            target = reader["data"]
+            assert target[-1] == float(total_size - 1)
+            assert target[-total_size] == 0.0
+            assert reader.read("data/-2") == float(total_size - 2)
+            assert reader.read(f"data/{total_size - 1}") == float(total_size - 1)
+            for index in (total_size, total_size + 5, -total_size - 1):
+                with pytest.raises(IndexError):
+                    print(target[index])
+            with pytest.raises(IndexError):
+                print(reader.read(f"data/{total_size}"))
+
+
 @pytest.mark.parametrize("threshold", [256, 8192])
 @pytest.mark.parametrize("cached", [True, False])
 def test_dict_exception(monkeypatch, tmpdir, cached, threshold):
@@ -226,11 +344,328 @@ def test_dict_exception(monkeypatch, tmpdir, cached, threshold):
         with LazyReader("test.msg", cached=cached) as reader:
             assert str(2 * total_size) not in reader
             assert reader.get(str(2 * total_size)) is None
+            with pytest.raises(KeyError) as error:
+                print(reader[str(2 * total_size)])
+            assert error.value.__context__ is None
             assert len(reader.keys()) == total_size
             assert len(reader.values()) == total_size
             assert len(reader.items()) == total_size
 
 
+def _read_toc(buffer: BytesIO):
+    magic_len: int = LazyWriter.magic_len()
+    content: bytes = buffer.getvalue()
+    toc_start: int = unpackb(content[magic_len : magic_len + 10].lstrip(b"\0"))
+    toc_size: int = unpackb(content[magic_len + 10 : magic_len + 20].lstrip(b"\0"))
+    toc_pos: int = magic_len + 20 + toc_start
+    return unpackb(content[toc_pos : toc_pos + toc_size], strict_map_key=False)
+
+
+def _rewrite_toc(buffer: BytesIO, toc, magic: bytes | None = None) -> BytesIO:
+    magic_len: int = LazyWriter.magic_len()
+    content: bytes = buffer.getvalue()
+    toc_start: int = unpackb(content[magic_len : magic_len + 10].lstrip(b"\0"))
+    packed_toc: bytes = packb(toc)
+
+    return BytesIO(
+        (content[:magic_len] if magic is None else magic)
+        + packb(toc_start).rjust(10, b"\0")
+        + packb(len(packed_toc)).rjust(10, b"\0")
+        + content[magic_len + 20 : magic_len + 20 + toc_start]
+        + packed_toc
+    )
+
+
+def _to_legacy_layout(node):
+    if isinstance(node, int):
+        return node
+
+    legacy: dict = {}
+    if node[0] is not None:
+        legacy["t"] = (
+            {k: _to_legacy_layout(v) for k, v in node[0].items()}
+            if isinstance(node[0], dict)
+            else [_to_legacy_layout(v) for v in node[0]]
+        )
+    if node[1] is not None:
+        legacy["p"] = node[1]
+    if len(node) > 2:
+        legacy["k"] = node[2]
+    return legacy
+
+
+@pytest.mark.parametrize("cached", [True, False])
+def test_numpy_kind_flag(monkeypatch, cached):
+    numpy = pytest.importorskip("numpy")
+
+    monkeypatch.setattr(config, "numpy_encoder", True)
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+
+    array = numpy.asfortranarray(numpy.arange(12.0).reshape(3, 4))
+    dates = numpy.array(["2024-01-01", "2025-06-30"], dtype="datetime64[ns]")
+    objects = numpy.array([1, "a", None], dtype=object)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write(
+            {
+                "array": array,
+                "dates": dates,
+                "objects": objects,
+                "other": b"\x80 plain bytes",
+            }
+        )
+
+    toc = _read_toc(buffer)
+    assert toc[0]["array"][2] == "nd"
+    assert toc[0]["dates"][2] == "nd"
+    assert toc[0]["objects"][2] == "np"
+    assert len(toc[0]["other"]) == 2
+
+    with LazyReader(BytesIO(buffer.getvalue()), cached=cached) as reader:
+        assert numpy.array_equal(reader["array"], array)
+        assert reader["array"].flags.writeable
+        assert reader["dates"].dtype == dates.dtype
+        assert numpy.array_equal(reader["dates"], dates)
+        assert list(reader["objects"]) == [1, "a", None]
+        assert reader["other"] == b"\x80 plain bytes"
+
+    # pickled arrays written without the flag are still recognised
+    toc[0]["objects"] = toc[0]["objects"][:2]
+    with LazyReader(_rewrite_toc(buffer, toc), cached=cached) as reader:
+        assert list(reader["objects"]) == [1, "a", None]
+        assert reader["other"] == b"\x80 plain bytes"
+
+
+@pytest.mark.parametrize("size", [0, 8192])
+def test_sets_and_tuples(monkeypatch, size):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", size)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write({"set": {3, 1, 2}, "tuple": (1, (2, 3), [4])})
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        assert reader.read("set") == [1, 2, 3]
+        assert reader.read("tuple") == [1, [2, 3], [4]]
+
+    monkeypatch.setattr(config, "deterministic_sets", False)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write({"set": {1, "a", None}})
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        assert sorted(reader.read("set"), key=str) == [1, None, "a"]
+
+
+@pytest.mark.parametrize("threshold", [0, 64, 8192])
+@pytest.mark.parametrize("trivial", [4, 20])
+def test_numpy_float_array(monkeypatch, threshold, trivial):
+    numpy = pytest.importorskip("numpy")
+
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", threshold)
+    monkeypatch.setattr(config, "trivial_size", trivial)
+
+    for array in (
+        numpy.linspace(0, 1, 1000),
+        numpy.arange(50, dtype=numpy.float32).reshape(5, 10),
+        numpy.array([1.5, numpy.nan, -numpy.inf]),
+        numpy.array([], dtype=numpy.float64),
+    ):
+        fast, plain = BytesIO(), BytesIO()
+        with LazyWriter(fast) as writer:
+            writer.write({"array": array, "nested": [array, 1]})
+        with LazyWriter(plain) as writer:
+            writer.write({"array": array.tolist(), "nested": [array.tolist(), 1]})
+
+        # the bulk encoding must be byte-identical to packing the list
+        assert fast.getvalue() == plain.getvalue()
+
+        fast.seek(0)
+        with LazyReader(fast) as reader:
+            numpy.testing.assert_array_equal(reader.read("nested/0"), array)
+
+
+@pytest.mark.parametrize("size", [0, 8192])
+@pytest.mark.parametrize("write_buffer_size", [1, 2**23])
+def test_msgspec_packer(monkeypatch, json_before, json_after, size, write_buffer_size):
+    pytest.importorskip("msgspec")
+
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", size)
+    monkeypatch.setattr(config, "write_buffer_size", write_buffer_size)
+
+    for count in (0, 15, 16, 2**16):
+        assert MsgspecPacker.pack_map_header(count) == Packer().pack_map_header(count)
+        assert MsgspecPacker.pack_array_header(count) == Packer().pack_array_header(
+            count
+        )
+
+    encoded, reference = BytesIO(), BytesIO()
+    with LazyWriter(encoded, packer=MsgspecPacker()) as writer:
+        writer.write(json_before)
+    with LazyWriter(reference) as writer:
+        writer.write(json_before)
+
+    assert encoded.getvalue() == reference.getvalue()
+
+    encoded.seek(0)
+    with LazyReader(encoded) as reader:
+        assert reader == json_after
+
+
+def test_short_writes(json_before, json_after):
+    # raw files may accept only part of the data per call
+    class ShortIO(BytesIO):
+        def write(self, data):
+            return super().write(bytes(data[:7]))
+
+    buffer = ShortIO()
+    with LazyWriter(buffer) as writer:
+        writer.write(json_before)
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        assert reader == json_after
+
+
+def test_custom_packer_keys(monkeypatch):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+
+    class Key:
+        def __init__(self, v):
+            self.v = v
+
+    # the TOC holds the original keys, it must be encoded with the given packer
+    packer = Packer(default=lambda o: o.v if isinstance(o, Key) else str(o))
+
+    buffer = BytesIO()
+    with LazyWriter(buffer, packer=packer) as writer:
+        writer.write({Key("x"): [1, 2, 3]})
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        assert reader.read("x") == [1, 2, 3]
+
+
+@pytest.mark.parametrize("size", [0, 8192])
+def test_pack_toc(monkeypatch, json_before, size):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", size)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write({**json_before, 1: "int key", b"bytes": [None, 2.5]})
+
+    toc = _read_toc(buffer)
+    assert pack_toc(toc) == packb(toc)
+
+
+@pytest.mark.parametrize("write_buffer_size", [1, 64, 2**23])
+def test_staged_writes(monkeypatch, json_before, json_after, write_buffer_size):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+    monkeypatch.setattr(config, "write_buffer_size", write_buffer_size)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write(json_before)
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        assert reader.read("glossary/GlossDiv/GlossList/GlossEntry/ID") == "SGML"
+        assert reader == json_after
+
+
+@pytest.mark.parametrize("read_buffer_size", [1, 2**16, 2**24])
+def test_prefetched_toc(monkeypatch, json_before, json_after, read_buffer_size):
+    monkeypatch.setattr(config, "read_buffer_size", read_buffer_size)
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+
+    class CountingIO(BytesIO):
+        reads: int = 0
+
+        def read(self, *args):
+            self.reads += 1
+            return super().read(*args)
+
+    buffer = CountingIO()
+    with LazyWriter(buffer) as writer:
+        writer.write(json_before)
+
+    buffer.seek(0)
+    counter = LazyStats()
+    with LazyReader(buffer, counter=counter) as reader:
+        assert buffer.reads == (1 if read_buffer_size > 1 else 2)
+        assert counter() > 0
+        assert reader == json_after
+
+
+def test_prefetch_size(monkeypatch):
+    monkeypatch.setattr(config, "read_buffer_size", 2**24)
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+
+    class SizingIO(BytesIO):
+        largest: int = 0
+
+        def read(self, *args):
+            data = super().read(*args)
+            self.largest = max(self.largest, len(data))
+            return data
+
+    buffer = SizingIO()
+    with LazyWriter(buffer) as writer:
+        writer.write({"padding": "x" * 2**16, "value": 1})
+
+    buffer.seek(0)
+    with LazyReader(buffer) as reader:
+        # a large read buffer does not make opening read more than a small block
+        assert buffer.largest < 2**16
+        assert reader["value"] == 1
+
+
+@pytest.mark.parametrize("size", [0, 8192])
+@pytest.mark.parametrize("cached", [True, False])
+def test_legacy_toc_layout(monkeypatch, json_before, json_after, size, cached):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", size)
+
+    buffer = BytesIO()
+    with LazyWriter(buffer) as writer:
+        writer.write(json_before)
+
+    legacy = _rewrite_toc(
+        buffer, _to_legacy_layout(_read_toc(buffer)), LazyWriter.legacy_magic
+    )
+
+    with LazyReader(legacy, cached=cached) as reader:
+        assert reader.read("glossary/GlossDiv/GlossList/GlossEntry/ID") == "SGML"
+        assert reader.read("some_set/-1") == 3
+        assert reader == json_after
+
+
+def test_legacy_combined_archive_append(tmpdir, json_after):
+    with tmpdir.as_cwd():
+        with LazyWriter("test_dict.msg") as writer:
+            writer.write(json_after)
+        with LazyWriter("test_list.msg") as writer:
+            writer.write([x for x in range(30)])
+
+        combined = BytesIO()
+        combine(combined, [FileInfo("test_dict.msg")])
+        combined = _rewrite_toc(
+            combined, _to_legacy_layout(_read_toc(combined)), LazyWriter.legacy_magic
+        )
+
+        combine(combined, [FileInfo("test_list.msg")], mode="a")
+
+        assert combined.getvalue().startswith(LazyWriter.magic)
+
+        combined.seek(0)
+        with LazyReader(combined) as reader:
+            assert reader.read("0/glossary/title") == "example glossary"
+            assert reader.read("1/-1") == 29
+
+
 @pytest.mark.parametrize("target", ["combined.msg", BytesIO()])
 def test_combine_archives(tmpdir, json_after, target):
     with tmpdir.as_cwd():
@@ -402,6 +837,132 @@ def test_combine_archives_append(tmpdir, json_after, target):
                 trivial.write(b"0" * 300)
             combine(target, FileInfo("trivial.msg", "no_name"))
 
+        # a plain archive has a TOC, but not the TOC of a combined archive
+        with open("test_list.msg", "rb") as plain:
+            plain_archive = BytesIO(plain.read())
+        with pytest.raises(ValueError, match="not a valid combined file"):
+            append(plain_archive, FileInfo("test_dict.msg"))
+
+
+def test_append_checks_names_first(tmpdir):
+    with tmpdir.as_cwd():
+        with LazyWriter("test_list.msg") as writer:
+            writer.write([x for x in range(30)])
+
+        combine("combined.msg", FileInfo("test_list.msg", "a"))
+        size: int = os.path.getsize("combined.msg")
+
+        # the second name clashes, the first file must not be copied either
+        with pytest.raises(ValueError, match="already exists"):
+            append(
+                "combined.msg",
+                [FileInfo("test_list.msg", "b"), FileInfo("test_list.msg", "a")],
+            )
+
+        assert os.path.getsize("combined.msg") == size
+        with LazyReader("combined.msg") as reader:
+            assert list(reader.keys()) == ["a"]
+
+
+def test_expected_size(tmpdir, json_after):
+    with tmpdir.as_cwd():
+        with LazyWriter("plain.msg") as writer:
+            writer.write(json_after)
+        with LazyWriter("reserved.msg", expected_size=2**20) as writer:
+            writer.write(json_after)
+
+        with open("plain.msg", "rb") as plain, open("reserved.msg", "rb") as reserved:
+            assert plain.read() == reserved.read()
+
+        with LazyCombiner("combined.msg", expected_size=2**20) as combiner:
+            with open("plain.msg", "rb") as plain:
+                combiner.write(plain, "plain")
+        with LazyCombiner("combined.msg", mode="a", expected_size=2**21) as combiner:
+            with open("reserved.msg", "rb") as reserved:
+                combiner.write(reserved, "reserved")
+
+        assert os.path.getsize("combined.msg") < 2**20
+        with LazyReader("combined.msg") as reader:
+            assert reader["plain"] == json_after
+            assert reader["reserved"] == json_after
+
+
+def test_combiner_sources(json_after):
+    source = BytesIO()
+    with LazyWriter(source) as writer:
+        writer.write(json_after)
+    content: bytes = source.getvalue()
+
+    archive = BytesIO()
+    with LazyCombiner(archive) as combiner:
+        combiner.write(BytesIO(content), "file")
+        combiner.write(iter([content[:7], content[7:]]), "chunks")
+        combiner.write([content[:7], bytearray(content[7:])], "list")
+        combiner.write(memoryview(content), "bytes")
+
+    archive.seek(0)
+    with LazyReader(archive) as reader:
+        assert reader["file"] == json_after
+        assert reader["chunks"] == json_after
+        assert reader["list"] == json_after
+        assert reader["bytes"] == json_after
+
+
+def test_combiner_file_sources(tmpdir, json_after):
+    with tmpdir.as_cwd():
+        with LazyWriter("source.msg") as writer:
+            writer.write(json_after)
+
+        with open("source.msg", "rb") as source:
+            with LazyCombiner("combined.msg") as combiner:
+                combiner.write(source, "first")
+                source.seek(0)
+                combiner.write(source, "second")
+                combiner.write(source, "empty")
+                with open("source.msg", "rb") as other:
+                    combiner.write(other.read(), "third")
+
+        with LazyReader("combined.msg") as reader:
+            assert reader["first"] == json_after
+            assert reader["second"] == json_after
+            assert reader["third"] == json_after
+            assert list(reader.keys()) == ["first", "second", "empty", "third"]
+
+
+def test_equality_short_circuit(monkeypatch, tmpdir, json_after):
+    monkeypatch.setattr(config, "small_obj_optimization_threshold", 0)
+
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write(json_after)
+
+        counter = LazyStats()
+        with LazyReader("test.msg", counter=counter) as reader:
+            counter.clear()
+            assert reader != {**json_after, "extra": None}
+            assert reader != {k: v for k, v in json_after.items() if k != "some_set"}
+            assert reader["some_tuple"] != [1, 2]
+            assert reader["glossary"] != {"title": None}
+            # nothing has been read to tell them apart
+            assert counter() == 0
+
+            assert reader == json_after
+            assert reader["glossary"] != {**json_after["glossary"], "title": None}
+
+
+def test_mapped_reader(tmpdir, json_after):
+    with tmpdir.as_cwd():
+        with LazyWriter("test.msg") as writer:
+            writer.write(json_after)
+
+        with LazyReader("test.msg") as reader:
+            assert reader == json_after
+
+        # empty files cannot be mapped and fall back to a plain file
+        open("empty.msg", "wb").close()
+        with pytest.raises(ValueError, match="Invalid file format"):
+            LazyReader("empty.msg")
+
 
 def test_recursive_combine(tmpdir):
     alternate = cycle(["combined.msg", "core.msg", "core.msg", "combined.msg"])